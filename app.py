@@ -1,28 +1,157 @@
+import math
 import os
+import secrets
+import time
+from typing import Dict, List, Optional
 
-from flask import Flask, current_app, flash, redirect, render_template, request, session, url_for
+from flask import Flask, abort, current_app, flash, g, has_app_context, redirect, render_template, request, session, url_for
+from flask_limiter.util import get_remote_address
 from flask_migrate import Migrate
-from sqlalchemy import or_
+from jinja2 import FileSystemBytecodeCache
+from sqlalchemy import delete, event, insert, or_, select, update
+from sqlalchemy.orm import raiseload, selectinload
 
 from config import Config
+from extensions import cache, init_server_session, limiter
 from forms import LoginForm, RegistrationForm
-from models import Property, User, db
-from werkzeug.security import check_password_hash, generate_password_hash
-from werkzeug.utils import secure_filename
+from models import Property, PropertyImage, User, db
+from passwords import hash_password, password_needs_rehash, verify_password
+from uploads import delete_upload_later, save_uploads
+
+
+# Verified when the identifier matches no account so it costs the same as an
+# Argon2 account. Accounts still on a legacy werkzeug hash (scrypt/PBKDF2) take
+# a different time until they log in once and are rehashed, so for them the
+# response time still reveals that the account exists.
+_DUMMY_PASSWORD_HASH = hash_password(secrets.token_urlsafe(16))
+
+
+_FEATURED_PROPERTIES = (
+    select(Property).options(raiseload(Property.images)).order_by(Property.id.desc()).limit(3)
+)
+_CATALOG_PROPERTIES = select(Property).options(raiseload(Property.images)).order_by(Property.id.desc())
+
+
+def _property_card(property: Property) -> Dict[str, object]:
+    return {
+        'id': property.id,
+        'name': property.name,
+        'description': property.description,
+        'location': property.location,
+        'price': property.price,
+        'main_image': property.main_image,
+    }
+
+
+@cache.cached(timeout=600, key_prefix='featured_properties')
+def _load_featured_properties() -> List[Dict[str, object]]:
+    return [_property_card(property) for property in db.session.scalars(_FEATURED_PROPERTIES)]
+
+
+@cache.memoize(timeout=600)
+def _load_catalog_page(cursor: Optional[int], limit: int) -> List[Dict[str, object]]:
+    statement = _CATALOG_PROPERTIES.limit(limit)
+    if cursor is not None:
+        statement = statement.where(Property.id < cursor)
+    return [_property_card(property) for property in db.session.scalars(statement)]
+
+
+# Serialized once; a fresh Response is still built per request because
+# after_request hooks (session cookie, rate limit headers) mutate it.
+_JSON_SUCCESS = b'{"success": true}'
+_JSON_FAILURE = b'{"success": false}'
+
+
+def _login_rate_limit_key() -> str:
+    identifier = (request.form.get('identifier') or '').strip().lower()
+    return f'{get_remote_address()}:{identifier}'
+
+
+def _image_in_use(url: str) -> bool:
+    return bool(
+        db.session.query(PropertyImage.id).filter_by(url=url).first()
+        or db.session.query(Property.id).filter_by(main_image=url).first()
+    )
+
+
+def _parse_price(raw_price: Optional[str]) -> Optional[float]:
+    try:
+        price = float(raw_price)
+    except (TypeError, ValueError):
+        return None
+    return price if math.isfinite(price) and price >= 0 else None
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany) -> None:
+    if has_app_context():
+        g.query_count = g.get('query_count', 0) + 1
+
+
+def _catalog_cache_key(*args, **kwargs) -> str:
+    # Every page shares the version so one write invalidates all cursors at once.
+    version = cache.get('catalog_version') or 0
+    cursor = request.args.get('cursor', type=int)
+    return f"view//catalogo/{version}/{'' if cursor is None else cursor}"
+
+
+def _skip_page_cache() -> bool:
+    # Authenticated views and pending flash messages render per-user content.
+    return bool(session.get('logged_in') or session.get('_flashes'))
 
 
 def create_app() -> Flask:
     app = Flask(__name__)
     app.config.from_object(Config)
+    app.config['CAPTCHA_ENABLED'] = bool(
+        app.config.get('CAPTCHA_SITE_KEY') and app.config.get('CAPTCHA_SECRET_KEY')
+    )
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+
+    bytecode_cache_dir = app.config.get('JINJA_BYTECODE_CACHE_DIR')
+    if bytecode_cache_dir:
+        # Compiled templates survive restarts and are shared by every worker
+        os.makedirs(bytecode_cache_dir, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(bytecode_cache_dir)
 
     db.init_app(app)
     Migrate(app, db)
+    cache.init_app(app)
+    limiter.init_app(app)
+    init_server_session(app)
+
+    if app.config['AUTO_CREATE_TABLES']:
+        # Runs once per process; production schemas are managed by migrations.
+        with app.app_context():
+            db.create_all()
+
+    if app.config['QUERY_COUNT_WARNING']:
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', _count_query)
+
+        @app.after_request
+        def warn_on_query_count(response):
+            query_count = g.get('query_count', 0)
+            if query_count > app.config['QUERY_COUNT_WARNING']:
+                app.logger.warning(
+                    '%s %s ejecutó %d consultas SQL', request.method, request.path, query_count
+                )
+            return response
+
+    def image_in_use_now(url: str) -> bool:
+        # Runs on the upload pool, outside the request's app context
+        with app.app_context():
+            return _image_in_use(url)
+
+    def invalidate_property_cache(property_id=None) -> None:
+        cache.delete_many('view//', 'featured_properties')
+        cache.delete_memoized(_load_catalog_page)
+        cache.set('catalog_version', time.time_ns(), timeout=0)
+        if property_id is not None:
+            cache.delete_memoized(property_detail, property_id)
 
     @app.route('/register', methods=['GET', 'POST'])
     def register():
         form = RegistrationForm(request.form if request.method == 'POST' else None)
-        captcha_site_key = current_app.config.get('CAPTCHA_SITE_KEY')
-        captcha_enabled = bool(captcha_site_key and current_app.config.get('CAPTCHA_SECRET_KEY'))
 
         if form.validate_on_submit():
             gmail = (form.gmail.data or '').strip().lower()
@@ -39,16 +168,23 @@ def create_app() -> Flask:
                 )
                 valid = False
 
-            if User.query.filter_by(gmail=gmail).first():
+            # Only the unique columns are needed to tell which one collides
+            taken = db.session.execute(
+                select(User.gmail, User.username).where(
+                    or_(User.gmail == gmail, User.username == username)
+                )
+            ).all()
+
+            if any(row.gmail == gmail for row in taken):
                 form.gmail.errors.append('Ya existe una cuenta asociada a este Gmail.')
                 valid = False
 
-            if User.query.filter_by(username=username).first():
+            if any(row.username == username for row in taken):
                 form.username.errors.append('El nombre de usuario ya está en uso.')
                 valid = False
 
             if valid:
-                password_hash = generate_password_hash(password)
+                password_hash = hash_password(password)
                 user = User(gmail=gmail, username=username, password_hash=password_hash)
                 db.session.add(user)
                 db.session.commit()
@@ -59,11 +195,17 @@ def create_app() -> Flask:
         return render_template(
             'register.html',
             form=form,
-            captcha_enabled=captcha_enabled,
-            captcha_site_key=captcha_site_key,
+            captcha_enabled=current_app.config['CAPTCHA_ENABLED'],
+            captcha_site_key=current_app.config['CAPTCHA_SITE_KEY'],
         )
 
     @app.route('/login', methods=['GET', 'POST'])
+    @limiter.limit(
+        lambda: current_app.config['LOGIN_RATE_LIMIT'],
+        key_func=_login_rate_limit_key,
+        methods=['POST'],
+        deduct_when=lambda response: response.status_code != 302,
+    )
     def login():
         form = LoginForm(request.form if request.method == 'POST' else None)
 
@@ -71,13 +213,24 @@ def create_app() -> Flask:
             identifier = (form.identifier.data or '').strip().lower()
             form.identifier.data = identifier
             password = form.password.data
-            user = User.query.filter(or_(User.gmail == identifier, User.username == identifier)).first()
+            user = db.session.execute(
+                select(
+                    User.id, User.username, User.gmail, User.name, User.password_hash, User.is_active
+                ).where(or_(User.gmail == identifier, User.username == identifier))
+            ).first()
 
-            if not user or not check_password_hash(user.password_hash, password):
+            password_ok = verify_password(user.password_hash if user else _DUMMY_PASSWORD_HASH, password)
+
+            if not user or not password_ok:
                 form.password.errors.append('Credenciales inválidas. Intenta nuevamente.')
             elif not user.is_active:
                 flash('Tu cuenta está desactivada. Contacta al administrador para reactivarla.', 'warning')
             else:
+                if password_needs_rehash(user.password_hash):
+                    db.session.execute(
+                        update(User).where(User.id == user.id).values(password_hash=hash_password(password))
+                    )
+                    db.session.commit()
                 session['logged_in'] = True
                 session['user_id'] = user.id
                 session['user_username'] = user.username
@@ -88,17 +241,18 @@ def create_app() -> Flask:
 
         return render_template('login.html', form=form)
 
+    @app.errorhandler(429)
+    def login_rate_limited(error):
+        # Other limits keep Flask's default 429 response instead of a login page
+        if request.endpoint != 'login':
+            return error
+        form = LoginForm(request.form)
+        form.password.errors.append('Demasiados intentos fallidos. Intenta nuevamente en unos segundos.')
+        return render_template('login.html', form=form), 429
+
     @app.route('/logout')
     def logout():
-        session_keys = [
-            'logged_in',
-            'user_id',
-            'user_name',
-            'user_username',
-            'user_gmail',
-        ]
-        for key in session_keys:
-            session.pop(key, None)
+        session.clear()
         flash('Sesión cerrada correctamente.')
         return redirect(url_for('index'))
 
@@ -117,32 +271,21 @@ def create_app() -> Flask:
             name = request.form['name']
             description = request.form['description']
             location = request.form['location']
-            price = float(request.form['price'])
+            price = _parse_price(request.form.get('price'))
+            if price is None:
+                flash('Introduce un precio válido.', 'warning')
+                return render_template('adminis.html'), 400
 
             main_image_file = request.files.get('main_image')
-            if main_image_file and main_image_file.filename != '':
-                main_filename = secure_filename(main_image_file.filename)
-                main_image_path = os.path.join(app.config['UPLOAD_FOLDER'], main_filename)
-                if not os.path.exists(app.config['UPLOAD_FOLDER']):
-                    os.makedirs(app.config['UPLOAD_FOLDER'])
-                main_image_file.save(main_image_path)
-                main_image_url = f'static/images/imagesProperty/{main_filename}'
-            else:
-                main_image_url = None
-
-            repertory_files = request.files.getlist('repertory_images')
-            repertory_urls = []
-            if repertory_files:
-                for file in repertory_files:
-                    if file.filename != '':
-                        filename = secure_filename(file.filename)
-                        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                        if not os.path.exists(app.config['UPLOAD_FOLDER']):
-                            os.makedirs(app.config['UPLOAD_FOLDER'])
-                        file.save(file_path)
-                        repertory_urls.append(f'static/images/imagesProperty/{filename}')
-
-            repertory_images = ','.join(repertory_urls)
+            has_main_image = bool(main_image_file and main_image_file.filename)
+            repertory_files = [file for file in request.files.getlist('repertory_images') if file.filename]
+
+            uploaded_urls = save_uploads(
+                ([main_image_file] if has_main_image else []) + repertory_files,
+                app.config['UPLOAD_FOLDER'],
+            )
+            main_image_url = uploaded_urls.pop(0) if has_main_image else None
+            repertory_urls = uploaded_urls
 
             new_property = Property(
                 name=name,
@@ -150,11 +293,19 @@ def create_app() -> Flask:
                 location=location,
                 price=price,
                 main_image=main_image_url,
-                repertory_images=repertory_images if repertory_images else None,
             )
-
             db.session.add(new_property)
+            db.session.flush()
+            if repertory_urls:
+                db.session.execute(
+                    insert(PropertyImage),
+                    [
+                        {'property_id': new_property.id, 'url': url, 'position': position}
+                        for position, url in enumerate(repertory_urls)
+                    ],
+                )
             db.session.commit()
+            invalidate_property_cache()
 
             return redirect(url_for('admin'))
 
@@ -165,61 +316,96 @@ def create_app() -> Flask:
         if not session.get('logged_in'):
             return redirect(url_for('login'))
 
-        property = Property.query.get_or_404(property_id)
+        property = db.session.get(Property, property_id, options=[selectinload(Property.images)])
+        if property is None:
+            abort(404)
 
         if request.method == 'POST':
             name = request.form['name']
             description = request.form['description']
             location = request.form['location']
-            price = float(request.form['price'])
+            price = _parse_price(request.form.get('price'))
+            if price is None:
+                flash('Introduce un precio válido.', 'warning')
+                return render_template('editProperty.html', property=property), 400
+
+            current_main_image = property.main_image
+            next_position = max((image.position for image in property.images), default=-1) + 1
+            # Return the connection to the pool instead of leaving it idle in a
+            # transaction while images are written; `property` is expired from
+            # here on, so the writes below go through property_id only.
+            db.session.commit()
 
             main_image_file = request.files.get('main_image')
-            if main_image_file and main_image_file.filename:
-                main_filename = secure_filename(main_image_file.filename)
-                main_image_path = os.path.join(app.config['UPLOAD_FOLDER'], main_filename)
-                main_image_file.save(main_image_path)
-                main_image_url = f'static/images/imagesProperty/{main_filename}'
-            else:
-                main_image_url = property.main_image
-
-            repertory_files = request.files.getlist('repertory_images')
-            repertory_urls = []
-            if repertory_files:
-                for file in repertory_files:
-                    if file.filename:
-                        filename = secure_filename(file.filename)
-                        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                        file.save(file_path)
-                        repertory_urls.append(f'static/images/imagesProperty/{filename}')
-
-            if property.repertory_images:
-                repertory_urls = property.repertory_images.split(',') + repertory_urls
-
-            property.name = name
-            property.description = description
-            property.location = location
-            property.price = price
-            property.main_image = main_image_url
-            property.repertory_images = ','.join(repertory_urls)
+            has_main_image = bool(main_image_file and main_image_file.filename)
+            repertory_files = [file for file in request.files.getlist('repertory_images') if file.filename]
 
+            uploaded_urls = save_uploads(
+                ([main_image_file] if has_main_image else []) + repertory_files,
+                app.config['UPLOAD_FOLDER'],
+            )
+            main_image_url = uploaded_urls.pop(0) if has_main_image else current_main_image
+            repertory_urls = uploaded_urls
+
+            updated = db.session.execute(
+                update(Property)
+                .where(Property.id == property_id)
+                .values(
+                    name=name,
+                    description=description,
+                    location=location,
+                    price=price,
+                    main_image=main_image_url,
+                )
+            ).rowcount
+            if not updated:
+                # Deleted by another request while the images were being written
+                db.session.rollback()
+                abort(404)
+            if repertory_urls:
+                db.session.execute(
+                    insert(PropertyImage),
+                    [
+                        {'property_id': property_id, 'url': url, 'position': position}
+                        for position, url in enumerate(repertory_urls, start=next_position)
+                    ],
+                )
             db.session.commit()
-            return redirect(url_for('property_detail', property_id=property.id))
+            invalidate_property_cache(property_id)
+            return redirect(url_for('property_detail', property_id=property_id))
 
         return render_template('editProperty.html', property=property)
 
     @app.route('/')
+    @cache.cached(timeout=60, unless=_skip_page_cache)
     def index():
-        featured_properties = Property.query.order_by(Property.id.desc()).limit(3).all()
+        featured_properties = _load_featured_properties()
         return render_template('index.html', featured_properties=featured_properties)
 
     @app.route('/catalogo')
+    @cache.cached(timeout=60, unless=_skip_page_cache, make_cache_key=_catalog_cache_key)
     def catalogo():
-        properties = Property.query.all()
-        return render_template('catalogo.html', properties=properties)
+        page_size = current_app.config['CATALOG_PAGE_SIZE']
+        cursor = request.args.get('cursor', type=int)
+        if cursor is not None and cursor <= 0:
+            # Ids start at 1, so such a cursor can only produce an empty page
+            return redirect(url_for('catalogo'))
+
+        properties = _load_catalog_page(cursor, page_size + 1)
+
+        next_cursor = properties[page_size - 1]['id'] if len(properties) > page_size else None
+        return render_template(
+            'catalogo.html',
+            properties=properties[:page_size],
+            next_cursor=next_cursor,
+        )
 
     @app.route('/property/<int:property_id>')
+    @cache.memoize(timeout=300, unless=_skip_page_cache)
     def property_detail(property_id):
-        property = Property.query.get_or_404(property_id)
+        property = db.session.get(Property, property_id, options=[selectinload(Property.images)])
+        if property is None:
+            abort(404)
         return render_template('propertyDetail.html', property=property)
 
     @app.route('/delete_property/<int:property_id>', methods=['POST'])
@@ -227,9 +413,13 @@ def create_app() -> Flask:
         if not session.get('logged_in'):
             return redirect(url_for('login'))
 
-        property_to_delete = Property.query.get_or_404(property_id)
-        db.session.delete(property_to_delete)
+        db.session.execute(delete(PropertyImage).where(PropertyImage.property_id == property_id))
+        deleted = db.session.execute(delete(Property).where(Property.id == property_id)).rowcount
+        if not deleted:
+            db.session.rollback()
+            abort(404)
         db.session.commit()
+        invalidate_property_cache(property_id)
         return redirect(url_for('catalogo'))
 
     @app.route('/remove_repertory_image', methods=['POST'])
@@ -239,21 +429,23 @@ def create_app() -> Flask:
 
         data = request.get_json()
         image_to_remove = data.get('image')
+        property_id = data.get('property_id')
 
         if image_to_remove:
-            image_path = os.path.join(app.config['UPLOAD_FOLDER'], image_to_remove.split('/')[-1])
-            if os.path.exists(image_path):
-                os.remove(image_path)
-
-            property = Property.query.filter(Property.repertory_images.like(f'%{image_to_remove}%')).first()
-            if property:
-                images = property.repertory_images.split(',')
-                images = [img for img in images if img != image_to_remove]
-                property.repertory_images = ','.join(images)
+            image = PropertyImage.query.filter_by(property_id=property_id, url=image_to_remove).first()
+            if image:
+                db.session.delete(image)
+                db.session.flush()
+                # Uploads are content-addressed, so other properties may share the file.
+                file_unused = not _image_in_use(image_to_remove)
                 db.session.commit()
-                return {'success': True}
+                invalidate_property_cache(property_id)
+
+                if file_unused:
+                    delete_upload_later(image_to_remove, app.config['UPLOAD_FOLDER'], image_in_use_now)
+                return app.response_class(_JSON_SUCCESS, mimetype='application/json')
 
-        return {'success': False}
+        return app.response_class(_JSON_FAILURE, mimetype='application/json')
 
     return app
 
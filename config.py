@@ -1,13 +1,43 @@
 import os
 
 
+_TRUE = frozenset({'1', 'true', 't', 'yes'})
+
+
+def _bool_env(name: str, default: str = 'false') -> bool:
+    return os.environ.get(name, default).lower() in _TRUE
+
+
+def _int_env(name: str, default: int) -> int:
+    return int(os.environ.get(name, default))
+
+
 class Config:
     BASE_DIR = os.path.abspath(os.path.dirname(__file__))
     SECRET_KEY = os.environ.get('SECRET_KEY', os.urandom(24))
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///site.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = {'query_cache_size': 1200}
+    AUTO_CREATE_TABLES = _bool_env('AUTO_CREATE_TABLES')
+    QUERY_COUNT_WARNING = _int_env('QUERY_COUNT_WARNING', 0)
+    CATALOG_PAGE_SIZE = _int_env('CATALOG_PAGE_SIZE', 24)
     UPLOAD_FOLDER = os.path.join(BASE_DIR, 'static', 'images', 'imagesProperty')
+    MAX_CONTENT_LENGTH = _int_env('MAX_CONTENT_LENGTH', 64 * 1024 * 1024)
+    MAX_FORM_MEMORY_SIZE = 500 * 1024
+    SEND_FILE_MAX_AGE_DEFAULT = _int_env('SEND_FILE_MAX_AGE_DEFAULT', 12 * 60 * 60)
+    JINJA_BYTECODE_CACHE_DIR = os.environ.get('JINJA_BYTECODE_CACHE_DIR')
+
+    REDIS_URL = os.environ.get('REDIS_URL')
+    CACHE_TYPE = 'RedisCache' if REDIS_URL else 'SimpleCache'
+    CACHE_REDIS_URL = REDIS_URL
+    CACHE_DEFAULT_TIMEOUT = 300
+
+    SESSION_TYPE = 'redis'
+    SESSION_PERMANENT = False
+    SESSION_SERIALIZATION_FORMAT = 'msgpack'
+    RATELIMIT_STORAGE_URI = REDIS_URL or 'memory://'
+    LOGIN_RATE_LIMIT = os.environ.get('LOGIN_RATE_LIMIT', '5 per 30 seconds')
 
-    MIN_PASSWORD_LENGTH = int(os.environ.get('MIN_PASSWORD_LENGTH', 8))
+    MIN_PASSWORD_LENGTH = _int_env('MIN_PASSWORD_LENGTH', 8)
     CAPTCHA_SITE_KEY = os.environ.get('CAPTCHA_SITE_KEY')
     CAPTCHA_SECRET_KEY = os.environ.get('CAPTCHA_SECRET_KEY')
@@ -0,0 +1,54 @@
+import hashlib
+
+import redis
+from flask import Flask
+from flask_caching import Cache
+from flask_limiter import Limiter
+from flask_limiter.util import get_remote_address
+from flask_session.redis import RedisSessionInterface
+
+
+cache = Cache()
+limiter = Limiter(key_func=get_remote_address)
+
+
+# These are private Flask-Session hooks; fail loudly rather than silently store plaintext ids
+for _hook in ('_retrieve_session_data', '_delete_session', '_upsert_session'):
+    if not hasattr(RedisSessionInterface, _hook):
+        raise RuntimeError(f'Flask-Session no longer provides RedisSessionInterface.{_hook}')
+
+
+class HashedRedisSessionInterface(RedisSessionInterface):
+    """Redis sessions keyed by the SHA-256 of the session id.
+
+    The id in the cookie acts as a bearer token, so a dump of Redis must not
+    be enough to hijack a session. A single SHA-256 pass is cheap enough for
+    every request because the id is already 256 bits of randomness.
+    """
+
+    def _hashed(self, store_id: str) -> str:
+        return self.key_prefix + hashlib.sha256(store_id.encode()).hexdigest()
+
+    def _retrieve_session_data(self, store_id):
+        return super()._retrieve_session_data(self._hashed(store_id))
+
+    def _delete_session(self, store_id):
+        super()._delete_session(self._hashed(store_id))
+
+    def _upsert_session(self, session_lifetime, session, store_id):
+        super()._upsert_session(session_lifetime, session, self._hashed(store_id))
+
+
+def init_server_session(app: Flask) -> None:
+    """Keep sessions in Redis when REDIS_URL is set; otherwise keep Flask's cookie sessions."""
+    redis_url = app.config.get('REDIS_URL')
+    if not redis_url:
+        return
+    app.config.setdefault('SESSION_REDIS', redis.Redis.from_url(redis_url))
+    app.session_interface = HashedRedisSessionInterface(
+        app,
+        client=app.config['SESSION_REDIS'],
+        key_prefix=app.config.get('SESSION_KEY_PREFIX', 'session:'),
+        permanent=app.config['SESSION_PERMANENT'],
+        serialization_format=app.config['SESSION_SERIALIZATION_FORMAT'],
+    )
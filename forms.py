@@ -1,26 +1,70 @@
 from __future__ import annotations
 
-import copy
+import hmac
 import re
 import secrets
-from collections import OrderedDict
+import string
+from functools import lru_cache
 from typing import Dict, Iterable, List, Optional as TypingOptional
 
-import requests
 from flask import current_app, request, session
 from markupsafe import Markup, escape
 
 
+_EMAIL_RE = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+# Deletes every allowed character, so anything left over is invalid
+_USERNAME_DELETE = str.maketrans('', '', string.ascii_letters + string.digits + '._-')
+_STATIC_ATTR_NAMES = frozenset({'type', 'name', 'id', 'placeholder'})
+
+
+@lru_cache(maxsize=None)
+def _captcha_session():
+    """Shared session so reCAPTCHA checks reuse keep-alive TLS connections to Google.
+
+    requests is imported here so apps without captcha keys never load it.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    captcha_session = requests.Session()
+    captcha_session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=16))
+    return captcha_session
+
+
+def _render_attrs(attrs: Dict[str, object]) -> str:
+    return ' '.join([f"{key}='{escape(str(value))}'" for key, value in attrs.items()])
+
+
 class ValidationError(Exception):
     """Simple validation error used by the custom form system."""
 
 
 class Label:
+    __slots__ = ('text', 'html')
+
     def __init__(self, text: str) -> None:
         self.text = text
+        # Labels never change after declaration, so escape them once
+        self.html = escape(text)
 
 
 class Field:
+    __slots__ = (
+        'label',
+        'validators',
+        'input_type',
+        'placeholder',
+        'name',
+        'id',
+        'data',
+        'errors',
+        'form',
+        'flags',
+        'max_length',
+        '_open_tag',
+    )
+    tag = 'input'
+
     def __init__(
         self,
         label: str,
@@ -39,22 +83,59 @@ class Field:
         self.errors: List[str] = []
         self.form: TypingOptional['BaseForm'] = None
         self.flags: Dict[str, bool] = {}
+        # Longest value any Length validator accepts; raw input is capped well above it
+        self.max_length: TypingOptional[int] = max(
+            (v.max for v in self.validators if isinstance(v, Length) and v.max is not None),
+            default=None,
+        )
+        self._open_tag = ''
+
+    def _clone(self) -> 'Field':
+        # Cheaper than copy.copy, which goes through the __reduce_ex__ machinery
+        clone = object.__new__(type(self))
+        for attr in Field.__slots__:
+            setattr(clone, attr, getattr(self, attr))
+        return clone
 
     def bind(self, form: 'BaseForm', name: str) -> 'Field':
-        bound = copy.copy(self)
-        bound.label = Label(self.label.text)
+        bound = self._clone()
         bound.validators = list(self.validators)
         bound.name = name
         bound.id = f'id_{name}'
         bound.form = form
         bound.errors = []
         bound.flags = {}
+        bound._cache_static_attrs()
         return bound
 
+    def _static_attrs(self) -> Dict[str, str]:
+        attrs = {'type': self.input_type, 'name': self.name, 'id': self.id}
+        if self.placeholder:
+            attrs['placeholder'] = self.placeholder
+        return attrs
+
+    def _cache_static_attrs(self) -> None:
+        # Built once per bind; only caller kwargs and the value vary per render
+        self._open_tag = f'<{self.tag} {_render_attrs(self._static_attrs())}'
+
+    def _open_tag_html(self, kwargs: Dict[str, object]) -> str:
+        if 'class_' in kwargs:
+            kwargs['class'] = kwargs.pop('class_')
+        if not _STATIC_ATTR_NAMES.isdisjoint(kwargs):
+            attrs = self._static_attrs()
+            attrs.update(kwargs)
+            return f'<{self.tag} {_render_attrs(attrs)}>'
+        if not kwargs:
+            return f'{self._open_tag}>'
+        return f'{self._open_tag} {_render_attrs(kwargs)}>'
+
     def process(self, formdata: TypingOptional[Dict[str, str]]) -> None:
         if formdata is not None and self.name in formdata:
             raw_value = formdata.get(self.name, '')
             if isinstance(raw_value, str):
+                if self.max_length is not None and len(raw_value) > self.max_length * 4:
+                    # Still too long for Length, but strip() no longer walks a huge payload
+                    raw_value = raw_value[:self.max_length * 4]
                 self.data = raw_value.strip()
             else:
                 self.data = raw_value
@@ -68,22 +149,17 @@ class Field:
         return self.input_type not in {'password', 'submit'}
 
     def __call__(self, **kwargs) -> Markup:
-        attrs = {'type': self.input_type, 'name': self.name, 'id': self.id}
-        if self.placeholder:
-            attrs['placeholder'] = self.placeholder
-        attrs.update(kwargs)
-        if 'class_' in attrs:
-            attrs['class'] = attrs.pop('class_')
         if self._should_include_value():
-            attrs.setdefault('value', self._value())
-        attr_html = ' '.join(f"{key}='{escape(str(value))}'" for key, value in attrs.items())
-        return Markup(f'<input {attr_html}>')
+            kwargs.setdefault('value', self._value())
+        return Markup(self._open_tag_html(kwargs))
 
     def __html__(self) -> str:
         return str(self())
 
 
 class PasswordField(Field):
+    __slots__ = ()
+
     def __init__(self, label: str, *, validators: TypingOptional[Iterable] = None) -> None:
         super().__init__(label, validators=validators, input_type='password')
 
@@ -94,34 +170,28 @@ class PasswordField(Field):
         else:
             self.data = ''
 
-    def __call__(self, **kwargs) -> Markup:
-        attrs = {'type': self.input_type, 'name': self.name, 'id': self.id}
-        attrs.update(kwargs)
-        if 'class_' in attrs:
-            attrs['class'] = attrs.pop('class_')
-        attr_html = ' '.join(f"{key}='{escape(str(value))}'" for key, value in attrs.items())
-        return Markup(f'<input {attr_html}>')
-
 
 class SubmitField(Field):
+    __slots__ = ()
+    tag = 'button'
+
     def __init__(self, label: str) -> None:
         super().__init__(label, input_type='submit')
 
     def __call__(self, **kwargs) -> Markup:
-        attrs = {'type': 'submit', 'name': self.name, 'id': self.id}
-        attrs.update(kwargs)
-        if 'class_' in attrs:
-            attrs['class'] = attrs.pop('class_')
-        attr_html = ' '.join(f"{key}='{escape(str(value))}'" for key, value in attrs.items())
-        return Markup(f"<button {attr_html}>{escape(self.label.text)}</button>")
+        return Markup(f'{self._open_tag_html(kwargs)}{self.label.html}</button>')
 
 
 class CSRFTokenField(Field):
+    __slots__ = ()
+
     def __init__(self) -> None:
         super().__init__('', input_type='hidden')
 
 
 class HiddenField(Field):
+    __slots__ = ()
+
     def __init__(self, label: str = '', *, validators: TypingOptional[Iterable] = None) -> None:
         super().__init__(label, validators=validators, input_type='hidden')
 
@@ -131,7 +201,7 @@ class HiddenField(Field):
 
 class BaseFormMeta(type):
     def __new__(mcls, name, bases, attrs):
-        declared_fields = OrderedDict()
+        declared_fields: Dict[str, Field] = {}
         for base in reversed(bases):
             if hasattr(base, '_declared_fields'):
                 declared_fields.update(base._declared_fields)
@@ -140,22 +210,29 @@ class BaseFormMeta(type):
                 declared_fields[key] = value
                 attrs.pop(key)
         attrs['_declared_fields'] = declared_fields
+        attrs['_declared_items'] = tuple(declared_fields.items())
+        attrs['_csrf_template'] = CSRFTokenField()
+        attrs['_non_data_field_names'] = frozenset(
+            [key for key, value in declared_fields.items() if isinstance(value, (SubmitField, CSRFTokenField))]
+            + ['csrf_token']
+        )
         return super().__new__(mcls, name, bases, attrs)
 
 
 class BaseForm(metaclass=BaseFormMeta):
     def __init__(self, formdata: TypingOptional[Dict[str, str]] = None) -> None:
-        self._fields: OrderedDict[str, Field] = OrderedDict()
-        for name, unbound in self._declared_fields.items():
+        self._fields: Dict[str, Field] = {}
+        for name, unbound in self._declared_items:
             bound = unbound.bind(self, name)
             bound.process(formdata)
             setattr(self, name, bound)
             self._fields[name] = bound
-        self.csrf_token = CSRFTokenField().bind(self, 'csrf_token')
+        self.csrf_token = self._csrf_template.bind(self, 'csrf_token')
+        self._expected_csrf = self._ensure_csrf_token()
         if request.method == 'POST':
             self.csrf_token.process(formdata)
         else:
-            self.csrf_token.data = self._ensure_csrf_token()
+            self.csrf_token.data = self._expected_csrf
         self.csrf_token.errors = []
         self._fields['csrf_token'] = self.csrf_token
 
@@ -174,7 +251,7 @@ class BaseForm(metaclass=BaseFormMeta):
         return {
             name: field.data or ''
             for name, field in self._fields.items()
-            if not isinstance(field, (SubmitField, CSRFTokenField))
+            if name not in self._non_data_field_names
         }
 
     def validate_on_submit(self) -> bool:
@@ -184,8 +261,8 @@ class BaseForm(metaclass=BaseFormMeta):
 
     def validate(self) -> bool:
         valid = True
-        for field in self._fields.values():
-            if isinstance(field, (SubmitField, CSRFTokenField)):
+        for name, field in self._fields.items():
+            if name in self._non_data_field_names:
                 continue
             field.errors = []
             optional_empty = False
@@ -203,9 +280,10 @@ class BaseForm(metaclass=BaseFormMeta):
                 valid = False
         if request.method == 'POST':
             submitted = self.csrf_token.data or ''
-            expected = session.get('_csrf_token') or self._ensure_csrf_token()
             self.csrf_token.errors = []
-            if not submitted or submitted != expected:
+            if not submitted or not hmac.compare_digest(
+                submitted.encode(), self._expected_csrf.encode()
+            ):
                 self.csrf_token.errors.append(
                     'Token CSRF inválido. Recarga la página e inténtalo nuevamente.'
                 )
@@ -239,11 +317,10 @@ class DataRequired:
 class Email:
     def __init__(self, message: str | None = None) -> None:
         self.message = message or 'Introduce un correo electrónico válido.'
-        self.pattern = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
 
     def __call__(self, form: BaseForm, field: Field) -> None:
         value = field.data or ''
-        if not self.pattern.match(value):
+        if not _EMAIL_RE.match(value):
             raise ValidationError(self.message)
 
 
@@ -280,6 +357,8 @@ class Optional(OptionalValidator):
 
 
 class StringField(Field):
+    __slots__ = ()
+
     def __init__(
         self,
         label: str,
@@ -301,11 +380,10 @@ class GmailValidator:
 class UsernameValidator:
     def __init__(self, message: str | None = None) -> None:
         self.message = message or 'El nombre de usuario solo puede contener letras, números, puntos o guiones bajos.'
-        self.pattern = re.compile(r'^[a-zA-Z0-9._-]+$')
 
     def __call__(self, form: BaseForm, field: Field) -> None:
         value = field.data or ''
-        if not self.pattern.match(value):
+        if not value or value.translate(_USERNAME_DELETE):
             raise ValidationError(self.message)
 
 
@@ -316,9 +394,8 @@ class ReCaptchaValidator:
         self.message = message or 'Debes completar el captcha.'
 
     def __call__(self, form: BaseForm, field: Field) -> None:
-        site_key = current_app.config.get('CAPTCHA_SITE_KEY')
-        secret_key = current_app.config.get('CAPTCHA_SECRET_KEY')
-        if not (site_key and secret_key):
+        config = current_app.config
+        if not config.get('CAPTCHA_ENABLED'):
             field.flags['captcha_disabled'] = True
             field.data = ''
             return
@@ -328,10 +405,10 @@ class ReCaptchaValidator:
             raise ValidationError(self.message)
 
         try:
-            response = requests.post(
+            response = _captcha_session().post(
                 self.VERIFY_URL,
                 data={
-                    'secret': secret_key,
+                    'secret': config['CAPTCHA_SECRET_KEY'],
                     'response': token,
                     'remoteip': request.remote_addr,
                 },
@@ -346,6 +423,8 @@ class ReCaptchaValidator:
 
 
 class ReCaptchaField(HiddenField):
+    __slots__ = ()
+
     def __init__(self) -> None:
         super().__init__('', validators=[ReCaptchaValidator()])
 
@@ -353,6 +432,7 @@ class ReCaptchaField(HiddenField):
         bound = super().bind(form, name)
         bound.name = 'g-recaptcha-response'
         bound.id = 'g-recaptcha-response'
+        bound._cache_static_attrs()
         return bound
 
     def __call__(self, **kwargs) -> Markup:
@@ -7,7 +7,7 @@ Create Date: 2025-11-11 17:05:59.998464
 """
 from __future__ import annotations
 
-import re
+import string
 
 from alembic import op
 import sqlalchemy as sa
@@ -19,9 +19,13 @@ down_revision = '20240604_add_gmail'
 branch_labels = None
 depends_on = None
 
+_USERNAME_CHARS = frozenset(string.ascii_lowercase + string.digits + '._-')
+_SANITIZE_TABLE = str.maketrans('', '', ''.join(chr(c) for c in range(128) if chr(c) not in _USERNAME_CHARS))
+
 
 def _sanitize_username(source: str, fallback: str) -> str:
-    base = re.sub(r'[^a-z0-9._-]', '', source.lower())
+    # Dropping non-ASCII first lets a 128-entry table stand in for [^a-z0-9._-]
+    base = source.lower().encode('ascii', 'ignore').decode('ascii').translate(_SANITIZE_TABLE)
     return base or fallback
 
 
@@ -40,6 +44,7 @@ def upgrade():
 
     # Normalize gmail values and generate usernames
     existing_usernames: set[str] = set()
+    updates = []
     rows = connection.execute(sa.select(users.c.id, users.c.email, users.c.gmail)).fetchall()
     for row in rows:
         email_value = (row.email or '').strip().lower()
@@ -57,11 +62,14 @@ def upgrade():
             candidate = f'{base_username}{suffix}'
             suffix += 1
         existing_usernames.add(candidate)
+        updates.append({'b_id': row.id, 'b_gmail': normalized_gmail, 'b_username': candidate})
 
+    if updates:
         connection.execute(
             users.update()
-            .where(users.c.id == row.id)
-            .values(gmail=normalized_gmail, username=candidate)
+            .where(users.c.id == sa.bindparam('b_id'))
+            .values(gmail=sa.bindparam('b_gmail'), username=sa.bindparam('b_username')),
+            updates,
         )
 
     with op.batch_alter_table('users', recreate='always') as batch_op:
@@ -92,12 +100,16 @@ def downgrade():
         )
 
     rows = connection.execute(sa.select(users.c.id, users.c.gmail)).fetchall()
-    for row in rows:
-        gmail_value = (row.gmail or '').strip().lower()
+    updates = [
+        {'b_id': row.id, 'b_email': (row.gmail or '').strip().lower() or None}
+        for row in rows
+    ]
+    if updates:
         connection.execute(
             users.update()
-            .where(users.c.id == row.id)
-            .values(email=gmail_value or None)
+            .where(users.c.id == sa.bindparam('b_id'))
+            .values(email=sa.bindparam('b_email')),
+            updates,
         )
 
     with op.batch_alter_table('users', recreate='always') as batch_op:
@@ -0,0 +1,98 @@
+"""move repertory images to property_image table
+
+Revision ID: 7c2e94b1d0a3
+Revises: 3830617476d9
+Create Date: 2026-10-15 09:12:41.305118
+
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c2e94b1d0a3'
+down_revision = '3830617476d9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('property_image',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('property_id', sa.Integer(), nullable=False),
+    sa.Column('url', sa.Text(), nullable=False),
+    sa.ForeignKeyConstraint(['property_id'], ['property.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('property_image', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_property_image_property_id'), ['property_id'], unique=False)
+
+    connection = op.get_bind()
+    properties = sa.table(
+        'property',
+        sa.column('id', sa.Integer()),
+        sa.column('repertory_images', sa.Text()),
+    )
+    property_images = sa.table(
+        'property_image',
+        sa.column('property_id', sa.Integer()),
+        sa.column('url', sa.Text()),
+    )
+
+    # Split the legacy comma-separated column into one row per image
+    rows = connection.execute(
+        sa.select(properties.c.id, properties.c.repertory_images)
+        .where(properties.c.repertory_images.isnot(None))
+        .order_by(properties.c.id)
+    ).fetchall()
+    image_rows = [
+        {'property_id': row.id, 'url': url}
+        for row in rows
+        for url in row.repertory_images.split(',')
+        if url
+    ]
+    if image_rows:
+        op.bulk_insert(property_images, image_rows)
+
+    with op.batch_alter_table('property', schema=None) as batch_op:
+        batch_op.drop_column('repertory_images')
+
+
+def downgrade():
+    with op.batch_alter_table('property', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('repertory_images', sa.Text(), nullable=True))
+
+    connection = op.get_bind()
+    properties = sa.table(
+        'property',
+        sa.column('id', sa.Integer()),
+        sa.column('repertory_images', sa.Text()),
+    )
+    property_images = sa.table(
+        'property_image',
+        sa.column('id', sa.Integer()),
+        sa.column('property_id', sa.Integer()),
+        sa.column('url', sa.Text()),
+    )
+
+    grouped: dict[int, list[str]] = {}
+    rows = connection.execute(
+        sa.select(property_images.c.property_id, property_images.c.url)
+        .order_by(property_images.c.property_id, property_images.c.id)
+    ).fetchall()
+    for row in rows:
+        grouped.setdefault(row.property_id, []).append(row.url)
+
+    for property_id, urls in grouped.items():
+        connection.execute(
+            properties.update()
+            .where(properties.c.id == property_id)
+            .values(repertory_images=','.join(urls))
+        )
+
+    with op.batch_alter_table('property_image', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_property_image_property_id'))
+
+    op.drop_table('property_image')
@@ -0,0 +1,54 @@
+"""add position to property_image
+
+Revision ID: a58f0c6e2d17
+Revises: e41b7d3a9c58
+Create Date: 2026-10-15 11:26:50.117403
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a58f0c6e2d17'
+down_revision = 'e41b7d3a9c58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('property_image', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('position', sa.Integer(), server_default='0', nullable=False))
+
+    connection = op.get_bind()
+    property_images = sa.table(
+        'property_image',
+        sa.column('id', sa.Integer()),
+        sa.column('property_id', sa.Integer()),
+        sa.column('position', sa.Integer()),
+    )
+
+    # Keep the current gallery order (insertion order) as the initial position
+    rows = connection.execute(
+        sa.select(property_images.c.id, property_images.c.property_id)
+        .order_by(property_images.c.property_id, property_images.c.id)
+    ).fetchall()
+    positions = {}
+    updates = []
+    for row in rows:
+        position = positions.get(row.property_id, 0)
+        positions[row.property_id] = position + 1
+        updates.append({'b_id': row.id, 'b_position': position})
+
+    if updates:
+        connection.execute(
+            property_images.update()
+            .where(property_images.c.id == sa.bindparam('b_id'))
+            .values(position=sa.bindparam('b_position')),
+            updates,
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('property_image', schema=None) as batch_op:
+        batch_op.drop_column('position')
@@ -30,4 +30,19 @@ class Property(db.Model):
     location = db.Column(db.String(200), nullable=False)
     price = db.Column(db.Float, nullable=False)
     main_image = db.Column(db.Text, nullable=True)
-    repertory_images = db.Column(db.Text, nullable=True)
+    images = db.relationship(
+        'PropertyImage',
+        back_populates='property',
+        order_by='PropertyImage.position',
+        cascade='all, delete-orphan',
+    )
+
+
+class PropertyImage(db.Model):
+    __tablename__ = 'property_image'
+
+    id = db.Column(db.Integer, primary_key=True)
+    property_id = db.Column(db.Integer, db.ForeignKey('property.id'), nullable=False, index=True)
+    url = db.Column(db.Text, nullable=False, index=True)
+    position = db.Column(db.Integer, nullable=False, server_default='0')
+    property = db.relationship('Property', back_populates='images')
@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
+from werkzeug.security import check_password_hash
+
+
+_password_hasher = PasswordHasher(time_cost=2, memory_cost=65536, parallelism=2)
+
+
+def _is_argon2(password_hash: str) -> bool:
+    return password_hash.startswith('$argon2')
+
+
+def hash_password(password: str) -> str:
+    return _password_hasher.hash(password)
+
+
+def verify_password(password_hash: str, password: str) -> bool:
+    """Check ``password`` against an argon2 hash or a legacy werkzeug hash."""
+    if not _is_argon2(password_hash):
+        try:
+            return check_password_hash(password_hash, password)
+        except ValueError:
+            return False
+    try:
+        return _password_hasher.verify(password_hash, password)
+    except (VerificationError, InvalidHashError):
+        return False
+
+
+def password_needs_rehash(password_hash: str) -> bool:
+    return not _is_argon2(password_hash) or _password_hasher.check_needs_rehash(password_hash)
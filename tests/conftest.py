@@ -0,0 +1,70 @@
+import os
+
+# Config reads the environment at import time, so this must run before the app module is loaded
+os.environ.setdefault('SECRET_KEY', 'test-secret-key')
+os.environ['DATABASE_URL'] = 'sqlite://'
+os.environ['AUTO_CREATE_TABLES'] = 'true'
+os.environ.pop('REDIS_URL', None)
+
+import pytest
+from sqlalchemy import event
+
+import app as app_module
+from extensions import cache
+from models import Property, PropertyImage, db
+
+
+@pytest.fixture
+def app():
+    flask_app = app_module.app
+    flask_app.config.update(TESTING=True)
+    with flask_app.app_context():
+        db.drop_all()
+        db.create_all()
+        cache.clear()
+    yield flask_app
+    with flask_app.app_context():
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def properties(app):
+    """Several properties with galleries, so any per-row lazy load shows up in the counts."""
+    with app.app_context():
+        created = []
+        for index in range(5):
+            property = Property(
+                name=f'Propiedad {index}',
+                description='Descripción de prueba',
+                location='Ciudad de México',
+                price=1_000_000 + index,
+                main_image=f'static/images/imagesProperty/main{index}.jpg',
+            )
+            property.images = [
+                PropertyImage(url=f'static/images/imagesProperty/{index}-{position}.jpg', position=position)
+                for position in range(3)
+            ]
+            db.session.add(property)
+            created.append(property)
+        db.session.commit()
+        return [property.id for property in created]
+
+
+@pytest.fixture
+def query_counter(app, properties):
+    """Collect every SQL statement the engine executes while the test runs."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    yield statements
+    event.remove(engine, 'before_cursor_execute', record)
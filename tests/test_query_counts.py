@@ -0,0 +1,27 @@
+"""Guard the public views against N+1 regressions.
+
+Each view must issue a fixed number of queries no matter how many
+properties or gallery images exist.
+"""
+
+
+def test_index_query_count(client, query_counter):
+    response = client.get('/')
+
+    assert response.status_code == 200
+    assert len(query_counter) == 1, query_counter
+
+
+def test_catalogo_query_count(client, query_counter):
+    response = client.get('/catalogo')
+
+    assert response.status_code == 200
+    assert len(query_counter) == 1, query_counter
+
+
+def test_property_detail_query_count(client, properties, query_counter):
+    response = client.get(f'/property/{properties[0]}')
+
+    assert response.status_code == 200
+    # The property row plus one selectin load for the whole gallery
+    assert len(query_counter) == 2, query_counter
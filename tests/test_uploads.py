@@ -0,0 +1,18 @@
+import io
+import os
+import stat
+
+from werkzeug.datastructures import FileStorage
+
+from uploads import UPLOAD_FILE_MODE, save_upload
+
+
+def test_saved_upload_is_readable_by_other_users(tmp_path):
+    upload = FileStorage(stream=io.BytesIO(b'contenido de prueba'), filename='foto.jpg')
+
+    url = save_upload(upload, str(tmp_path))
+
+    path = tmp_path / url.rsplit('/', 1)[-1]
+    mode = stat.S_IMODE(os.stat(path).st_mode)
+    assert mode == UPLOAD_FILE_MODE
+    assert mode & stat.S_IROTH
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Callable, Iterable, List, Optional
+
+from werkzeug.datastructures import FileStorage
+from werkzeug.utils import secure_filename
+
+
+UPLOAD_URL_PREFIX = 'static/images/imagesProperty'
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# mkstemp creates files as 0600; published images must be readable by the web server
+_current_umask = os.umask(0)
+os.umask(_current_umask)
+UPLOAD_FILE_MODE = 0o666 & ~_current_umask
+
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='uploads')
+
+
+@lru_cache(maxsize=1024)
+def _upload_extension(filename: str) -> str:
+    return os.path.splitext(secure_filename(filename))[1].lower()
+
+
+def save_upload(file: FileStorage, upload_folder: str) -> str:
+    """Store an upload under the hash of its content and return its static URL.
+
+    The stream is hashed while it is copied to a temp file, so it is read only
+    once. The temp file always replaces the target, even when that content is
+    already on disk, so a concurrent delete_upload cannot leave a new row
+    pointing at a file it removed.
+    """
+    extension = _upload_extension(file.filename or '')
+    digest = hashlib.blake2b(digest_size=16)
+    fd, temp_path = tempfile.mkstemp(dir=upload_folder, suffix='.part')
+    try:
+        os.fchmod(fd, UPLOAD_FILE_MODE)
+        with os.fdopen(fd, 'wb', buffering=UPLOAD_CHUNK_SIZE) as destination:
+            while True:
+                chunk = file.stream.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                destination.write(chunk)
+
+        filename = f'{digest.hexdigest()}{extension}'
+        os.replace(temp_path, os.path.join(upload_folder, filename))
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+    return f'{UPLOAD_URL_PREFIX}/{filename}'
+
+
+def save_uploads(files: Iterable[FileStorage], upload_folder: str) -> List[str]:
+    """Store several uploads concurrently and return their URLs in the same order."""
+    futures = [_executor.submit(save_upload, file, upload_folder) for file in files]
+    return [future.result() for future in futures]
+
+
+def delete_upload(
+    url: str, upload_folder: str, in_use: Optional[Callable[[str], bool]] = None
+) -> None:
+    # Re-checked right before removing: another request may have saved the same
+    # content and referenced it since the delete was scheduled.
+    if in_use is not None and in_use(url):
+        return
+    path = os.path.join(upload_folder, url.rsplit('/', 1)[-1])
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def delete_upload_later(
+    url: str, upload_folder: str, in_use: Optional[Callable[[str], bool]] = None
+) -> None:
+    """Remove an uploaded file on the upload pool without waiting for it."""
+    _executor.submit(delete_upload, url, upload_folder, in_use)